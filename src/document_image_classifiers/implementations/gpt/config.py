@@ -13,6 +13,9 @@ class DocumentImageGPTClassifierOutput(DocumentImageClassifierOutput[ClassifierS
     pass
 
 
+# Bump whenever the prompt text changes so that cached responses are invalidated
+PROMPT_VERSION = 1
+
 DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG = {
     "model": "gpt-4o-2024-08-06",
     "supported_document_types": ["receipt"],
@@ -21,4 +24,9 @@ DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG = {
         status=StatusCodes.UNKNOWN_ERROR,
         details="An unknown error occurred. Please try again later.",
     ),
+    "prompt_cache_key": "doc_pipeline_v1",
+    "few_shot": False,
+    "response_cache_size": 1024,
+    "max_image_side": 512,
+    "stream": True,
 }
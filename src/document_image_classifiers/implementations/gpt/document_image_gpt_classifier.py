@@ -1,6 +1,8 @@
-from typing import List, Union, Dict
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple, Union, Dict
 from PIL import Image
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from document_image_classifiers.interfaces import (
     DocumentImageClassifier,
     generate_error_messages,
@@ -9,10 +11,78 @@ from document_image_classifiers.interfaces import (
 )
 from document_image_classifiers.implementations.gpt.config import (
     DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG,
+    PROMPT_VERSION,
     DocumentImageGPTClassifierOutput,
 )
-from utils import encode_image_to_base64, handle_errors
-from tiktoken import encoding_for_model
+from utils import encode_image_to_base64, handle_errors, ResponseCache
+
+
+_USER_TEXT_PART = {"type": "text", "text": "Classify the type of this document."}
+
+
+@dataclass(slots=True)
+class _FastOutput:
+    """
+    Lightweight error output for the internal paths of the classifier.
+    Converted to the public output model once, without validation, before it is returned.
+    """
+    status: StatusCodes
+    details: str
+
+
+@lru_cache(maxsize=None)
+def _build_assistant_prompts(supported_document_types: Tuple[str, ...]) -> Tuple[DocumentImageGPTClassifierOutput, ...]:
+    """
+    Generate assistant examples for supported document types and status codes.
+    Cached so that classifiers with the same supported document types share them.
+    """
+    error_messages = generate_error_messages(supported_document_types)
+    examples = []
+    for doc_type in supported_document_types:
+        examples.append(
+            DocumentImageGPTClassifierOutput(
+                status=StatusCodes.OK,
+                details=ClassifierSchema(document_type=doc_type)
+            )
+        )
+    for status in StatusCodes:
+        if status != StatusCodes.OK:
+            examples.append(
+                DocumentImageGPTClassifierOutput(
+                    status=status,
+                    details=error_messages[status]
+                )
+            )
+    return tuple(examples)
+
+
+@lru_cache(maxsize=None)
+def _build_developer_system_prompt(supported_document_types: Tuple[str, ...]) -> str:
+    """
+    Generate the system prompt for the supported document types.
+    Cached so that classifiers with the same supported document types share it.
+    """
+    supported_types = ", ".join(supported_document_types)
+    status_code_descriptions = "\n".join(
+        f"- {status}: {desc}" for status, desc in generate_error_messages(supported_document_types).items()
+    )
+
+    return (
+        f"You are a document type classifier using GPT. You will receive an image containing a document.\n\n"
+        f"Supported Document Types: {supported_types}\n"
+        f"Status Codes:\n{status_code_descriptions}\n"
+        f"Return a JSON object with 'status' and 'details' fields."
+    )
+
+
+def _build_output_example(supported_document_types: Tuple[str, ...]) -> str:
+    """
+    Generate a compact example of a valid classifier output to embed in the developer message.
+    """
+    return DocumentImageGPTClassifierOutput(
+        status=StatusCodes.OK,
+        details=ClassifierSchema(document_type=supported_document_types[0])
+    ).model_dump_json()
 
 
 class DocumentImageGPTClassifier(DocumentImageClassifier[ClassifierSchema]):
@@ -21,24 +91,38 @@ class DocumentImageGPTClassifier(DocumentImageClassifier[ClassifierSchema]):
     """
 
     def __init__(self,
-                openai_api_key: str,
+                openai_api_key: Optional[str],
                 model: str = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["model"],
                 supported_document_types: List[str] = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["supported_document_types"],
                 response_format: type = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["response_format"],
-                default_response: DocumentImageGPTClassifierOutput = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["default_response"]):
+                default_response: DocumentImageGPTClassifierOutput = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["default_response"],
+                prompt_cache_key: str = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["prompt_cache_key"],
+                max_image_side: int = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["max_image_side"],
+                few_shot: bool = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["few_shot"],
+                client: Optional[OpenAI] = None,
+                async_client: Optional[AsyncOpenAI] = None,
+                response_cache_size: int = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["response_cache_size"],
+                stream: bool = DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["stream"]):
         
-        if not openai_api_key:
+        if not openai_api_key and (client is None or async_client is None):
             raise ValueError("An OpenAI API key must be provided.")
         
         super().__init__(supported_document_types= supported_document_types)
         self.model = model
         self.response_format = response_format
         self.default_response = default_response
+        self.prompt_cache_key = prompt_cache_key
+        self.max_image_side = max_image_side
+        self.few_shot = few_shot
+        self.stream = stream
         self._openai_api_key = openai_api_key
-        self._client = OpenAI(api_key=openai_api_key)
+        self._client = client if client is not None else OpenAI(api_key=openai_api_key)
+        self._async_client = async_client if async_client is not None else AsyncOpenAI(api_key=openai_api_key)
         self._error_messages = generate_error_messages(self.supported_document_types)
-        self._assistant_prompts = self._generate_assistant_prompts()
-        self._developer_system_prompt = self._generate_developer_system_prompt()
+        self._assistant_prompts = _build_assistant_prompts(tuple(self.supported_document_types)) if few_shot else ()
+        self._developer_system_prompt = _build_developer_system_prompt(tuple(self.supported_document_types))
+        self._static_prefix = self._generate_static_prefix()
+        self._response_cache = ResponseCache(maxsize=response_cache_size)
         
         # Initialize token counters
         self._total_input_tokens = 0
@@ -51,47 +135,154 @@ class DocumentImageGPTClassifier(DocumentImageClassifier[ClassifierSchema]):
         """
         Classify the document type or return an error status with an explanation.
         """
+        messages, cache_key, error_output = self._prepare_messages(image)
+        if error_output:
+            return self._to_output(error_output)
+
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
+
         try:
-            base64_image = encode_image_to_base64(image)
-        except ValueError as e:
-            return DocumentImageGPTClassifierOutput(
-                status=StatusCodes.INVALID_IMAGE,
-                details=f"Error in encoding image: {e}",
-            )
+            if self.stream:
+                output = self._classify_stream(messages)
+            else:
+                response = self._client.beta.chat.completions.parse(
+                    model=self.model,
+                    messages=messages,
+                    response_format=self.response_format,
+                    extra_body={"prompt_cache_key": self.prompt_cache_key},
+                )
+                output = self._handle_response(response)
+        except OpenAIError as e:
+            return self._to_output(_FastOutput(StatusCodes.UNKNOWN_ERROR, f"Error in OpenAI API: {e}"))
 
-        messages = self.user_prompt(base64_image)
-        
-        # Count input tokens
-        input_tokens = self._count_tokens(messages)
-        self._last_input_tokens = input_tokens
-        self._total_input_tokens += input_tokens
+        return self._cache_output(cache_key, self._to_output(output))
+
+    @handle_errors(default_value=DOCUMENT_IMAGE_GPT_CLASSIFIER_CONFIG["default_response"])
+    async def classify_async(self, image: Union[Image.Image, str]) -> DocumentImageGPTClassifierOutput:
+        """
+        Classify the document type asynchronously or return an error status with an explanation.
+        """
+        messages, cache_key, error_output = self._prepare_messages(image)
+        if error_output:
+            return self._to_output(error_output)
+
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
 
         try:
-            response = self._client.beta.chat.completions.parse(
-                model=self.model,
-                messages=messages,
-                response_format=self.response_format,
-            )
+            if self.stream:
+                output = await self._classify_stream_async(messages)
+            else:
+                response = await self._async_client.beta.chat.completions.parse(
+                    model=self.model,
+                    messages=messages,
+                    response_format=self.response_format,
+                    extra_body={"prompt_cache_key": self.prompt_cache_key},
+                )
+                output = self._handle_response(response)
         except OpenAIError as e:
-            return DocumentImageGPTClassifierOutput(
-                status=StatusCodes.UNKNOWN_ERROR,
-                details=f"Error in OpenAI API: {e}",
-            )
+            return self._to_output(_FastOutput(StatusCodes.UNKNOWN_ERROR, f"Error in OpenAI API: {e}"))
+
+        return self._cache_output(cache_key, self._to_output(output))
 
-        # Count output tokens
-        output_tokens = response['usage']['completion_tokens']
+    def _classify_stream(self, messages: List[Dict]) -> Union[_FastOutput, DocumentImageGPTClassifierOutput]:
+        """
+        Stream the structured output and stop reading as soon as an error status arrives.
+        """
+        with self._client.beta.chat.completions.stream(
+            model=self.model,
+            messages=messages,
+            response_format=self.response_format,
+            stream_options={"include_usage": True},
+            extra_body={"prompt_cache_key": self.prompt_cache_key},
+        ) as stream:
+            for event in stream:
+                early_output = self._early_exit_output(event)
+                if early_output is not None:
+                    return early_output
+            return self._handle_response(stream.get_final_completion())
+
+    async def _classify_stream_async(self, messages: List[Dict]) -> Union[_FastOutput, DocumentImageGPTClassifierOutput]:
+        """
+        Stream the structured output asynchronously and stop reading as soon as an error status arrives.
+        """
+        async with self._async_client.beta.chat.completions.stream(
+            model=self.model,
+            messages=messages,
+            response_format=self.response_format,
+            stream_options={"include_usage": True},
+            extra_body={"prompt_cache_key": self.prompt_cache_key},
+        ) as stream:
+            async for event in stream:
+                early_output = self._early_exit_output(event)
+                if early_output is not None:
+                    return early_output
+            return self._handle_response(await stream.get_final_completion())
+
+    def _early_exit_output(self, event) -> Optional[_FastOutput]:
+        """
+        Return the error output once a complete non-OK status has been streamed, or None to keep reading.
+        Structured outputs are generated in schema order, so `status` arrives within the first few tokens.
+        The details of an early exit are the default message for the status, and its token usage is not recorded.
+        """
+        if event.type != "content.delta" or not isinstance(event.parsed, dict):
+            return None
+        # Partial parsing drops unterminated strings, so a present status is complete
+        status = event.parsed.get("status")
+        if status is None or status == StatusCodes.OK or status not in self._error_messages:
+            return None
+        return _FastOutput(StatusCodes(status), self._error_messages[status])
+
+    def _prepare_messages(self, image: Union[Image.Image, str]) -> (List[Dict], Tuple, _FastOutput):
+        """
+        Encode the image and build the request messages and the response cache key.
+        """
+        try:
+            base64_image = encode_image_to_base64(image, max_side=self.max_image_side)
+        except ValueError as e:
+            return None, None, _FastOutput(StatusCodes.INVALID_IMAGE, f"Error in encoding image: {e}")
+
+        cache_key = ResponseCache.make_key(base64_image, self.model, PROMPT_VERSION, tuple(self.supported_document_types), self.few_shot)
+        return self.user_prompt(base64_image), cache_key, None
+
+    @staticmethod
+    def _to_output(output: Union[_FastOutput, DocumentImageGPTClassifierOutput]) -> DocumentImageGPTClassifierOutput:
+        """
+        Convert an internal error output to the public output model, bypassing validation.
+        """
+        if isinstance(output, _FastOutput):
+            return DocumentImageGPTClassifierOutput.model_construct(**asdict(output))
+        return output
+
+    def _cache_output(self, cache_key: Tuple, output: DocumentImageGPTClassifierOutput) -> DocumentImageGPTClassifierOutput:
+        """
+        Cache successful outputs so that re-submitted images skip the API call.
+        """
+        if output.status == StatusCodes.OK:
+            self._response_cache.set(cache_key, output)
+        return output
+
+    def _handle_response(self, response) -> Union[_FastOutput, DocumentImageGPTClassifierOutput]:
+        """
+        Record token usage and construct the unified output from the API response.
+        """
+        # Count tokens as reported by the API
+        input_tokens = response.usage.prompt_tokens
+        self._last_input_tokens = input_tokens
+        self._total_input_tokens += input_tokens
+
+        output_tokens = response.usage.completion_tokens
         self._last_output_tokens = output_tokens
         self._total_output_tokens += output_tokens
 
         # Validate and construct the unified output
-        try:
-            validated_data = DocumentImageGPTClassifierOutput(**response["data"])
-            return validated_data
-        except KeyError as e:
-            return DocumentImageGPTClassifierOutput(
-                status=StatusCodes.EXTRACTION_FAILED,
-                details=f"Missing required field: {str(e)}",
-            )
+        message = response.choices[0].message
+        if message.parsed is None:
+            return _FastOutput(StatusCodes.EXTRACTION_FAILED, f"Missing structured output: {message.refusal}")
+        return DocumentImageGPTClassifierOutput.model_validate(message.parsed, from_attributes=True)
 
     @property
     def summary(self) -> Dict[str, str]:
@@ -105,62 +296,40 @@ class DocumentImageGPTClassifier(DocumentImageClassifier[ClassifierSchema]):
             "total_output_tokens": self._total_output_tokens,
         }
 
-    def _count_tokens(self, messages: List[Dict[str, str]]) -> int:
-        """
-        Count the number of tokens in the input messages.
+    def _generate_static_prefix(self) -> Tuple[Dict, ...]:
         """
-        encoding = encoding_for_model(self.model)
-        return sum(len(encoding.encode(value)) for message in messages for value in message.values())
-
-    def _generate_assistant_prompts(self) -> List[DocumentImageGPTClassifierOutput]:
+        Render the developer and assistant messages once so that every request
+        shares a byte-identical prefix that OpenAI can serve from its prompt cache.
+        Unless few-shot prompting is enabled, a single compact output example is
+        embedded in the developer message instead of one assistant message per status code.
         """
-        Generate assistant examples dynamically for supported document types and status codes.
-        """
-        examples = []
-        for doc_type in self.supported_document_types:
-            examples.append(
-                DocumentImageGPTClassifierOutput(
-                    status=StatusCodes.OK,
-                    details=ClassifierSchema(document_type=doc_type)
-                )
+        if self.few_shot:
+            return (
+                {"role": "developer", "content": self._developer_system_prompt},
+                *({"role": "assistant", "content": example.model_dump_json()} for example in self._assistant_prompts),
             )
-        for status in StatusCodes:
-            if status != StatusCodes.OK:
-                examples.append(
-                    DocumentImageGPTClassifierOutput(
-                        status=status,
-                        details=self._error_messages[status]
-                    )
-                )
-        return examples
-
-    def _generate_developer_system_prompt(self) -> str:
-        """
-        Generate the system prompt dynamically.
-        """
-        supported_types = ", ".join(self.supported_document_types)
-        status_code_descriptions = "\n".join(
-            f"- {status}: {desc}" for status, desc in self._error_messages.items()
-        )
-
         return (
-            f"You are a document type classifier using GPT. You will receive an image containing a document.\n\n"
-            f"Supported Document Types: {supported_types}\n"
-            f"Status Codes:\n{status_code_descriptions}\n"
-            f"Return a JSON object with 'status' and 'details' fields."
+            {
+                "role": "developer",
+                "content": (
+                    f"{self._developer_system_prompt}\n"
+                    f"Example valid output: {_build_output_example(tuple(self.supported_document_types))}"
+                ),
+            },
         )
 
     def user_prompt(self, base64_image: str) -> List[Dict]:
         """
         Generate the structured messages for GPT input.
+        The image is always the last message so the static prefix stays cacheable.
         """
         return [
-            {"role": "developer", "content": self._developer_system_prompt},
-            *[{"role": "assistant", "content": example} for example in self._assistant_prompts],
+            *self._static_prefix,
             {
                 "role": "user",
-                "content": (
-                    f"Classify the type of this document: data:image/jpeg;base64,{base64_image}"
-                ),
+                "content": [
+                    _USER_TEXT_PART,
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                ],
             },
         ]
@@ -1,6 +1,8 @@
-from typing import Generic, TypeVar, Union, List, Dict
+import asyncio
+from functools import cache
+from types import MappingProxyType
+from typing import Generic, Mapping, Tuple, TypeVar, Union, List, Dict
 from pydantic import BaseModel, Field
-from pydantic.generics import GenericModel
 from PIL import Image
 from utils import StrEnum
 from abc import ABC, abstractmethod
@@ -31,7 +33,7 @@ class StatusCodes(StrEnum):
 # Define a generic type variable for schema
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
 
-class DocumentImageClassifierOutput(GenericModel, Generic[SchemaType]):
+class DocumentImageClassifierOutput(BaseModel, Generic[SchemaType]):
     """
     Unified response format for document classification.
 
@@ -54,17 +56,27 @@ class ClassifierSchema(BaseModel):
     document_type: str
 
 
+# Error messages that do not depend on the supported document types
+_ERROR_MESSAGES = MappingProxyType({
+    StatusCodes.NO_TEXT: "No text detected in the image. Please provide an image with visible text.",
+    StatusCodes.NO_DOCUMENT: "No document detected in the image. Please provide an image containing a document.",
+    StatusCodes.UNSUPPORTED_TYPE: "Unsupported document type.",
+    StatusCodes.EXTRACTION_FAILED: "Failed to extract data from the document. Please try again.",
+    StatusCodes.FAKE_DOCUMENT: "Fake document detected. Please provide an image of a real document.",
+    StatusCodes.UNKNOWN_ERROR: "An unknown error occurred. Please try again later.",
+    StatusCodes.INVALID_IMAGE: "Invalid image format. Please provide an image in JPEG or PNG format."
+})
+
 # Function to generate error messages dynamically
-def generate_error_messages(supported_document_types: List[str]) -> Dict[StatusCodes, str]:
-    return {
-        StatusCodes.NO_TEXT: "No text detected in the image. Please provide an image with visible text.",
-        StatusCodes.NO_DOCUMENT: "No document detected in the image. Please provide an image containing a document.",
-        StatusCodes.UNSUPPORTED_TYPE: f"Unsupported document type. Please provide an image of one of the following: {', '.join(doc_type for doc_type in supported_document_types)}.",
-        StatusCodes.EXTRACTION_FAILED: "Failed to extract data from the document. Please try again.",
-        StatusCodes.FAKE_DOCUMENT: "Fake document detected. Please provide an image of a real document.",
-        StatusCodes.UNKNOWN_ERROR: "An unknown error occurred. Please try again later.",
-        StatusCodes.INVALID_IMAGE: "Invalid image format. Please provide an image in JPEG or PNG format."
-    }
+def generate_error_messages(supported_document_types: List[str]) -> Mapping[StatusCodes, str]:
+    return _generate_error_messages(tuple(supported_document_types))
+
+@cache
+def _generate_error_messages(supported_document_types: Tuple[str, ...]) -> Mapping[StatusCodes, str]:
+    return MappingProxyType({
+        **_ERROR_MESSAGES,
+        StatusCodes.UNSUPPORTED_TYPE: f"Unsupported document type. Please provide an image of one of the following: {', '.join(supported_document_types)}.",
+    })
     
 
 class DocumentImageClassifier(ABC, Generic[SchemaType]):
@@ -72,7 +84,6 @@ class DocumentImageClassifier(ABC, Generic[SchemaType]):
     Abstract base class for document image classifiers.
     """
     def __init__(self, supported_document_types: List[str]):
-        print("Supported Document Types: ", supported_document_types)
         self.supported_document_types = supported_document_types
 
     @abstractmethod
@@ -84,6 +95,26 @@ class DocumentImageClassifier(ABC, Generic[SchemaType]):
         :return: Classification output.
         """
         pass
+
+    async def classify_async(self, image: Union[Image.Image, str]) -> DocumentImageClassifierOutput[SchemaType]:
+        """
+        Classify the document type asynchronously.
+        Runs `classify` in a worker thread unless overridden with a native async implementation.
+
+        :param image: The input image (PIL.Image.Image).
+        :return: Classification output.
+        """
+        return await asyncio.to_thread(self.classify, image)
+
+    def classify_batch(self, images: List[Union[Image.Image, str]]) -> List[DocumentImageClassifierOutput[SchemaType]]:
+        """
+        Classify a batch of document images.
+        Calls `classify` for each image unless overridden with a natively batched implementation.
+
+        :param images: The input images (PIL.Image.Image).
+        :return: Classification outputs in the same order as the images.
+        """
+        return [self.classify(image) for image in images]
     
     @property
     @abstractmethod
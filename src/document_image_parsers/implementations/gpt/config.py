@@ -9,6 +9,9 @@ class DocumentImageReceiptParserOutput(DocumentImageParserOutput[ReceiptSchema])
     """
     pass
 
+# Bump whenever the prompt text changes so that cached responses are invalidated
+PROMPT_VERSION = 1
+
 # Initialize configuration
 RECEIPT_PARSER_CONFIG = {
     "model": "gpt-4o-2024-08-06",
@@ -17,5 +20,9 @@ RECEIPT_PARSER_CONFIG = {
     "default_response": DocumentImageReceiptParserOutput(
         status=StatusCodes.UNKNOWN_ERROR,
         details="An unknown error occurred. Please try again later."
-    )
+    ),
+    "prompt_cache_key": "doc_pipeline_v1",
+    "few_shot": False,
+    "response_cache_size": 1024,
+    "max_image_side": 1024,
 }
\ No newline at end of file
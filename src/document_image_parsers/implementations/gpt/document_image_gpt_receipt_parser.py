@@ -1,7 +1,9 @@
+import json
+from functools import lru_cache
 from PIL import Image
-from typing import Union, List, Dict
-from openai import OpenAI, OpenAIError
-from tiktoken import encoding_for_model
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple, Union, List, Dict
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 from document_image_parsers.interfaces import (
     DocumentImageParser,
     ReceiptSchema,
@@ -9,31 +11,109 @@ from document_image_parsers.interfaces import (
     DocumentImageParserOutput,
     generate_error_messages,
 )
-from document_image_parsers.implementations.gpt.config import (RECEIPT_PARSER_CONFIG, DocumentImageReceiptParserOutput)
-from utils import encode_image_to_base64, handle_errors
+from document_image_parsers.implementations.gpt.config import (RECEIPT_PARSER_CONFIG, PROMPT_VERSION, DocumentImageReceiptParserOutput)
+from utils import encode_image_to_base64, handle_errors, ResponseCache
+
+_EXAMPLE_RECEIPT_DETAILS = {
+    "store_name": "Example Store",
+    "total": 100.0,
+    "currency": "USD"
+}
+
+_USER_TEXT_PART = {"type": "text", "text": "Parse the following receipt."}
+
+
+@lru_cache(maxsize=None)
+def _build_error_templates(target_document_type: str) -> Mapping[StatusCodes, DocumentImageReceiptParserOutput]:
+    """
+    Build one validated output per error status with its default message.
+    Error paths copy these with `model_copy`, which skips validation.
+    Cached so that parsers with the same target document type share them.
+    """
+    return MappingProxyType({
+        status: DocumentImageReceiptParserOutput(status=status, details=message)
+        for status, message in generate_error_messages(target_document_type).items()
+    })
+
+
+@lru_cache(maxsize=None)
+def _build_developer_system_prompt(target_document_type: str) -> str:
+    """
+    Generate the system prompt for the parser.
+    Cached so that parsers with the same target document type share it.
+    """
+    status_code_descriptions = "\n".join(
+        f"- {code}: {description}" for code, description in generate_error_messages(target_document_type).items()
+    )
+    return (
+        f"You are a receipt parser. Parse receipts into structured JSON.\n\n"
+        f"Target Document Type: {target_document_type}\n\n"
+        f"Error Codes:\n{status_code_descriptions}\n"
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_assistant_prompts(target_document_type: str) -> Tuple[Dict[str, str], ...]:
+    """
+    Generate assistant examples for supported scenarios.
+    Each example is serialized to a compact JSON string once, since chat message content must be a string.
+    Cached so that parsers with the same target document type share them.
+    """
+    examples = [
+        {"status": StatusCodes.OK.value, "details": _EXAMPLE_RECEIPT_DETAILS},
+        *[
+            {"status": code.value, "details": description}
+            for code, description in generate_error_messages(target_document_type).items()
+        ]
+    ]
+    return tuple(
+        {"role": "assistant", "content": json.dumps(example, separators=(",", ":"))}
+        for example in examples
+    )
+
+
+def _build_output_example() -> str:
+    """
+    Generate a compact example of a valid parser output to embed in the developer message.
+    """
+    return json.dumps({"status": StatusCodes.OK.value, "details": _EXAMPLE_RECEIPT_DETAILS}, separators=(",", ":"))
+
 
 class DocumentImageGPTReceiptParser(DocumentImageParser[ReceiptSchema]):
     """
     A parser that uses OpenAI's GPT API to extract structured data from expense receipts.
     """
     def __init__(self,
-                openai_api_key: str, 
+                openai_api_key: Optional[str], 
                 model: str = RECEIPT_PARSER_CONFIG["model"],
                 target_document_type: str = RECEIPT_PARSER_CONFIG["target_document_type"],
                 response_format = RECEIPT_PARSER_CONFIG["response_format"],
-                default_response = RECEIPT_PARSER_CONFIG["default_response"]):
-        if not openai_api_key:
+                default_response = RECEIPT_PARSER_CONFIG["default_response"],
+                prompt_cache_key: str = RECEIPT_PARSER_CONFIG["prompt_cache_key"],
+                max_image_side: int = RECEIPT_PARSER_CONFIG["max_image_side"],
+                few_shot: bool = RECEIPT_PARSER_CONFIG["few_shot"],
+                client: Optional[OpenAI] = None,
+                async_client: Optional[AsyncOpenAI] = None,
+                response_cache_size: int = RECEIPT_PARSER_CONFIG["response_cache_size"]):
+        if not openai_api_key and (client is None or async_client is None):
             raise ValueError("An OpenAI API key must be provided.")
 
         super().__init__(target_document_type=target_document_type)
         self.model = model
         self.response_format = response_format
         self.default_response = default_response
+        self.prompt_cache_key = prompt_cache_key
+        self.max_image_side = max_image_side
+        self.few_shot = few_shot
         self._openai_api_key = openai_api_key
-        self._client = OpenAI(api_key=openai_api_key)
+        self._client = client if client is not None else OpenAI(api_key=openai_api_key)
+        self._async_client = async_client if async_client is not None else AsyncOpenAI(api_key=openai_api_key)
         self._error_messages = generate_error_messages(target_document_type)
-        self._developer_system_prompt = self._generate_developer_system_prompt()
-        self._assistant_prompts = self._generate_assistant_prompts()
+        self._developer_system_prompt = _build_developer_system_prompt(target_document_type)
+        self._assistant_prompts = _build_assistant_prompts(target_document_type) if few_shot else ()
+        self._static_prefix = self._generate_static_prefix()
+        self._response_cache = ResponseCache(maxsize=response_cache_size)
+        self._error_templates = _build_error_templates(target_document_type)
 
         # Initialize token counters
         self._total_input_tokens = 0
@@ -46,95 +126,120 @@ class DocumentImageGPTReceiptParser(DocumentImageParser[ReceiptSchema]):
         """
         Parse the given receipt document to extract structured data.
         """
-        try:
-            base64_image = encode_image_to_base64(image)
-        except ValueError as e:
-            return DocumentImageReceiptParserOutput(
-                status=StatusCodes.INVALID_IMAGE,
-                details=f"Error encoding image: {e}"
-            )
+        messages, cache_key, error_output = self._prepare_messages(image)
+        if error_output:
+            return error_output
 
-        messages = self._generate_user_prompt(base64_image)
-        input_tokens = self._count_tokens(messages)
-        self._last_input_tokens = input_tokens
-        self._total_input_tokens += input_tokens
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
 
         try:
             response = self._client.beta.chat.completions.parse(
                 model=self.model,
                 messages=messages,
                 response_format=self.response_format,
+                extra_body={"prompt_cache_key": self.prompt_cache_key},
             )
         except OpenAIError as e:
-            return DocumentImageReceiptParserOutput(
-                status=StatusCodes.UNKNOWN_ERROR,
-                details=f"Error from OpenAI API: {e}"
-            )
+            return self._error_templates[StatusCodes.UNKNOWN_ERROR].model_copy(update={"details": f"Error from OpenAI API: {e}"})
+
+        return self._cache_output(cache_key, self._handle_response(response))
+
+    @handle_errors(default_value=RECEIPT_PARSER_CONFIG["default_response"])
+    async def parse_async(self, image: Union[Image.Image, str]) -> DocumentImageReceiptParserOutput:
+        """
+        Parse the given receipt document asynchronously to extract structured data.
+        """
+        messages, cache_key, error_output = self._prepare_messages(image)
+        if error_output:
+            return error_output
 
-        self._total_output_tokens += response['usage']['completion_tokens']
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
 
         try:
-            return DocumentImageReceiptParserOutput(**response["data"])
-        except KeyError as e:
-            return DocumentImageReceiptParserOutput(
-                status=StatusCodes.EXTRACTION_FAILED,
-                details=f"Missing required field: {e}"
+            response = await self._async_client.beta.chat.completions.parse(
+                model=self.model,
+                messages=messages,
+                response_format=self.response_format,
+                extra_body={"prompt_cache_key": self.prompt_cache_key},
             )
+        except OpenAIError as e:
+            return self._error_templates[StatusCodes.UNKNOWN_ERROR].model_copy(update={"details": f"Error from OpenAI API: {e}"})
 
-    def _generate_developer_system_prompt(self) -> str:
+        return self._cache_output(cache_key, self._handle_response(response))
+
+    def _prepare_messages(self, image: Union[Image.Image, str]) -> (List[Dict], Tuple, DocumentImageReceiptParserOutput):
         """
-        Generate the system prompt for the parser.
+        Encode the image and build the request messages and the response cache key.
         """
-        status_code_descriptions = "\n".join(
-            f"- {code}: {description}" for code, description in self._error_messages.items()
-        )
-        return (
-            f"You are a receipt parser. Parse receipts into structured JSON.\n\n"
-            f"Target Document Type: {self.target_document_type}\n\n"
-            f"Error Codes:\n{status_code_descriptions}\n"
-        )
+        try:
+            base64_image = encode_image_to_base64(image, max_side=self.max_image_side)
+        except ValueError as e:
+            return None, None, self._error_templates[StatusCodes.INVALID_IMAGE].model_copy(update={"details": f"Error encoding image: {e}"})
+
+        cache_key = ResponseCache.make_key(base64_image, self.model, PROMPT_VERSION, self.target_document_type, self.few_shot)
+        return self._generate_user_prompt(base64_image), cache_key, None
 
-    def _generate_assistant_prompts(self) -> List[Dict[str, str]]:
+    def _cache_output(self, cache_key: Tuple, output: DocumentImageReceiptParserOutput) -> DocumentImageReceiptParserOutput:
         """
-        Generate assistant examples for supported scenarios.
+        Cache successful outputs so that re-submitted images skip the API call.
         """
-        return [
+        if output.status == StatusCodes.OK:
+            self._response_cache.set(cache_key, output)
+        return output
+
+    def _handle_response(self, response) -> DocumentImageReceiptParserOutput:
+        """
+        Record token usage and construct the parser output from the API response.
+        """
+        self._last_input_tokens = response.usage.prompt_tokens
+        self._total_input_tokens += response.usage.prompt_tokens
+        self._last_output_tokens = response.usage.completion_tokens
+        self._total_output_tokens += response.usage.completion_tokens
+
+        message = response.choices[0].message
+        if message.parsed is None:
+            return self._error_templates[StatusCodes.EXTRACTION_FAILED].model_copy(update={"details": f"Missing structured output: {message.refusal}"})
+        return DocumentImageReceiptParserOutput.model_validate(message.parsed, from_attributes=True)
+
+    def _generate_static_prefix(self) -> Tuple[Dict, ...]:
+        """
+        Render the developer and assistant messages once so that every request
+        shares a byte-identical prefix that OpenAI can serve from its prompt cache.
+        Unless few-shot prompting is enabled, a single compact output example is
+        embedded in the developer message instead of one assistant message per status code.
+        """
+        if self.few_shot:
+            return (
+                {"role": "developer", "content": self._developer_system_prompt},
+                *self._assistant_prompts,
+            )
+        return (
             {
-                "role": "assistant",
-                "content": {
-                    "status": StatusCodes.OK,
-                    "details": {
-                        "store_name": "Example Store",
-                        "total": 100.0,
-                        "currency": "USD"
-                    }
-                }
+                "role": "developer",
+                "content": f"{self._developer_system_prompt}\nExample valid output: {_build_output_example()}",
             },
-            *[
-                {
-                    "role": "assistant",
-                    "content": {"status": code, "details": description}
-                } for code, description in self._error_messages.items()
-            ]
-        ]
+        )
 
     def _generate_user_prompt(self, base64_image: str) -> List[Dict]:
         """
         Generate a structured user prompt for GPT input.
+        The image is always the last message so the static prefix stays cacheable.
         """
         return [
-            {"role": "developer", "content": self._developer_system_prompt},
-            *self._assistant_prompts,
-            {"role": "user", "content": f"Parse the following receipt: data:image/jpeg;base64,{base64_image}"}
+            *self._static_prefix,
+            {
+                "role": "user",
+                "content": [
+                    _USER_TEXT_PART,
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                ],
+            },
         ]
 
-    def _count_tokens(self, messages: List[Dict[str, str]]) -> int:
-        """
-        Count the number of tokens in the GPT request messages.
-        """
-        encoding = encoding_for_model(self.model)
-        return sum(len(encoding.encode(value)) for message in messages for value in message.values())
-
     def __str__(self) -> str:
         """
         Override the string representation of the parser.
@@ -1,7 +1,9 @@
+import asyncio
 from PIL import Image
-from typing import Dict, List, Optional, Union, Generic, TypeVar
+from functools import cache
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Union, Generic, TypeVar
 from pydantic import BaseModel, Field
-from pydantic.generics import GenericModel
 from utils import StrEnum
 from abc import ABC, abstractmethod
 class TaxBreakdown(BaseModel):
@@ -97,21 +99,29 @@ class StatusCodes(StrEnum):
     FAKE_DOCUMENT = "FAKE_DOCUMENT"
     UNKNOWN_ERROR = "UNKNOWN_ERROR"
 
-def generate_error_messages(target_doc_type : str):
-    return{
-        StatusCodes.INVALID_IMAGE: "Invalid image format. Please provide an image in JPEG or PNG format.",
-        StatusCodes.NO_TEXT: "No text detected in the image. Please provide an image with visible text.",
+# Error messages that do not depend on the target document type
+_ERROR_MESSAGES = MappingProxyType({
+    StatusCodes.INVALID_IMAGE: "Invalid image format. Please provide an image in JPEG or PNG format.",
+    StatusCodes.NO_TEXT: "No text detected in the image. Please provide an image with visible text.",
+    StatusCodes.NO_DOCUMENT: "No document detected in the image.",
+    StatusCodes.UNSUPPORTED_FORMAT: "The provided document format is not supported for parsing.",
+    StatusCodes.EXTRACTION_FAILED: "Failed to extract data from the document. Please try again.",
+    StatusCodes.FAKE_DOCUMENT: "Fake document detected. Please provide an image of a real document.",
+    StatusCodes.UNKNOWN_ERROR: "An unknown error occurred. Please try again later.",
+})
+
+@cache
+def generate_error_messages(target_doc_type : str) -> Mapping[StatusCodes, str]:
+    return MappingProxyType({
+        **_ERROR_MESSAGES,
         StatusCodes.NO_DOCUMENT: f"No document detected in the image. Please provide an image containing a {target_doc_type}.",
         StatusCodes.UNSUPPORTED_FORMAT: f"The provided document format is not supported for parsing. Please provide an image of a(n) {target_doc_type}.",
-        StatusCodes.EXTRACTION_FAILED: "Failed to extract data from the document. Please try again.",
-        StatusCodes.FAKE_DOCUMENT: "Fake document detected. Please provide an image of a real document.",
-        StatusCodes.UNKNOWN_ERROR: "An unknown error occurred. Please try again later.",
-}
+    })
 
 # Define a generic type variable for schema
 SchemaType = TypeVar("SchemaType", bound=BaseModel)
 
-class DocumentImageParserOutput(GenericModel, Generic[SchemaType]):
+class DocumentImageParserOutput(BaseModel, Generic[SchemaType]):
     """
     Unified response format for document parsing.
 
@@ -144,3 +154,23 @@ class DocumentImageParser(ABC, Generic[SchemaType]):
         :return: A DocumentImageParserOutput containing the parsed data or an error message.
         """
         pass
+
+    async def parse_async(self, image: Union[Image.Image, str]) -> DocumentImageParserOutput[SchemaType]:
+        """
+        Parse the given document image asynchronously.
+        Runs `parse` in a worker thread unless overridden with a native async implementation.
+
+        :param image: The input image (PIL.Image.Image).
+        :return: A DocumentImageParserOutput containing the parsed data or an error message.
+        """
+        return await asyncio.to_thread(self.parse, image)
+
+    def parse_batch(self, images: List[Union[Image.Image, str]]) -> List[DocumentImageParserOutput[SchemaType]]:
+        """
+        Parse a batch of document images.
+        Calls `parse` for each image unless overridden with a natively batched implementation.
+
+        :param images: The input images (PIL.Image.Image).
+        :return: Parser outputs in the same order as the images.
+        """
+        return [self.parse(image) for image in images]
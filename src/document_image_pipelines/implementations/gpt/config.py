@@ -1,33 +1,82 @@
-from typing import List
+from functools import cached_property
+from typing import List, Optional
 from pydantic import BaseModel, Field
-from document_image_parsers import DocumentImageParser, DocumentImageGPTReceiptParser
-from document_image_classifiers import DocumentImageClassifier, DocumentImageGPTClassifier
-from document_image_processors import DocumentImageProcessor, DocumentFormatConverter, DocumentImageResizer
+from document_image_parsers import DocumentImageParser, DocumentImageGPTReceiptParser, ReceiptSchema
+from document_image_classifiers import DocumentImageClassifier, DocumentImageGPTClassifier, StatusCodes
+from document_image_processors import DocumentImageProcessor, DocumentImageResizeConverter
 from env_config import OPENAI_API_KEY
+from openai_client import get_openai_client, get_async_openai_client
 
 _SUPPORTED_DOCUMENT_TYPES = ["receipt"]
 
-_PROCESSORS = [
-        DocumentFormatConverter(),
-        DocumentImageResizer()
-    ]
-
-_CLASSIFIERS = [
-        DocumentImageGPTClassifier(
-            openai_api_key=OPENAI_API_KEY,
-            supported_document_types=_SUPPORTED_DOCUMENT_TYPES
-        )
-    ]
-
-_PARSERS = [
-        DocumentImageGPTReceiptParser(
-            openai_api_key=OPENAI_API_KEY,
-            target_document_type="receipt"
-        )
-    ]
+
+class ClassifyAndParseOutput(BaseModel):
+    """
+    Combined response format for classifying and parsing a document in a single GPT call.
+
+    Attributes:
+        status (StatusCodes): The status of the classification and parsing process.
+        document_type (Optional[str]): The type of document classified.
+        receipt (Optional[ReceiptSchema]): Parsed receipt data if the document is a receipt.
+    """
+    status: StatusCodes
+    document_type: Optional[str] = Field(
+        ..., description="Classified document type if status is OK; null otherwise."
+    )
+    receipt: Optional[ReceiptSchema] = Field(
+        ..., description="Parsed receipt data if the document is a receipt; null otherwise."
+    )
+
+
+class _PipelineRegistry:
+    """
+    Default pipeline components, built on first access so that importing this
+    module does not construct OpenAI clients.
+    """
+
+    @cached_property
+    def processors(self) -> List[DocumentImageProcessor]:
+        return [
+            DocumentImageResizeConverter()
+        ]
+
+    @cached_property
+    def classifiers(self) -> List[DocumentImageClassifier]:
+        return [
+            DocumentImageGPTClassifier(
+                openai_api_key=OPENAI_API_KEY,
+                supported_document_types=_SUPPORTED_DOCUMENT_TYPES,
+                client=get_openai_client(OPENAI_API_KEY),
+                async_client=get_async_openai_client(OPENAI_API_KEY)
+            )
+        ]
+
+    @cached_property
+    def parsers(self) -> List[DocumentImageParser]:
+        return [
+            DocumentImageGPTReceiptParser(
+                openai_api_key=OPENAI_API_KEY,
+                target_document_type="receipt",
+                client=get_openai_client(OPENAI_API_KEY),
+                async_client=get_async_openai_client(OPENAI_API_KEY)
+            )
+        ]
+
+
+DOCUMENT_IMAGE_GPT_PIPELINE_REGISTRY = _PipelineRegistry()
+
+# Bump whenever the prompt text changes so that cached responses are invalidated
+PROMPT_VERSION = 2
 
 DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG = {
-    "processors": _PROCESSORS,
-    "classifiers": _CLASSIFIERS,
-    "parsers": _PARSERS,
+    "response_format": ClassifyAndParseOutput,
+    "max_concurrency": 10,
+    "requests_per_minute": 500,
+    "tokens_per_minute": 30000,
+    "estimated_tokens_per_request": 2000,
+    "max_retries": 5,
+    "retry_backoff_seconds": 1.0,
+    "batch_completion_window": "24h",
+    "batch_poll_interval_seconds": 60.0,
+    "response_cache_size": 1024,
 }
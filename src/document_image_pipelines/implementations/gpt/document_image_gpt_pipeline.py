@@ -1,10 +1,67 @@
+import asyncio
+import json
+import logging
+import tempfile
+import time
+from functools import lru_cache
 from PIL import Image
-from typing import List, Union
-from document_image_pipelines.interfaces import DocumentImagePipeline, DocumentImagePipelineOutput
-from document_image_pipelines.implementations.gpt.config import DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG
-from document_image_parsers import DocumentImageParser, DocumentImageParserOutput
-from document_image_classifiers import DocumentImageClassifier, DocumentImageClassifierOutput
+from typing import List, Optional, Tuple, Union, Dict
+from openai import OpenAIError, RateLimitError
+from pydantic import ValidationError
+from document_image_pipelines.interfaces import DocumentImagePipeline, DocumentImagePipelineOutput, StatusCodes
+from document_image_pipelines.implementations.gpt.config import (
+    DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG,
+    DOCUMENT_IMAGE_GPT_PIPELINE_REGISTRY,
+    PROMPT_VERSION,
+    ClassifyAndParseOutput,
+)
+from document_image_parsers import DocumentImageParser, DocumentImageParserOutput, DocumentImageGPTReceiptParser, DocumentImageReceiptParserOutput
+from document_image_parsers import StatusCodes as ParserStatusCodes
+from document_image_classifiers import DocumentImageClassifier, DocumentImageClassifierOutput, DocumentImageGPTClassifier, generate_error_messages
+from document_image_classifiers import StatusCodes as ClassifierStatusCodes
 from document_image_processors import DocumentImageProcessor
+from utils import encode_image_to_base64, RateLimiter, ResponseCache
+
+_USER_TEXT_PART = {"type": "text", "text": "Classify and parse this document."}
+
+
+@lru_cache(maxsize=None)
+def _response_format_param(response_format: type) -> Dict:
+    """
+    Convert a pydantic response format into the `response_format` request parameter for raw requests.
+    The SDK only exposes this conversion from a private module, so it is imported here,
+    where a breaking SDK upgrade only affects Batch API submissions.
+    """
+    from openai.lib._parsing._completions import type_to_response_format_param
+    return type_to_response_format_param(response_format)
+
+
+@lru_cache(maxsize=None)
+def _build_prompt_prefix(supported_document_types: Tuple[str, ...], parsed_document_types: Tuple[str, ...]) -> Tuple[Dict, ...]:
+    """
+    Build the developer message for the combined classify-and-parse call.
+    Only the classifier status codes are listed, since they are the values `ClassifyAndParseOutput.status` accepts.
+    Cached so that every request with the same classifier and parsers shares a byte-identical prefix.
+    """
+    status_code_descriptions = "\n".join(
+        f"- {status}: {desc}" for status, desc in generate_error_messages(supported_document_types).items()
+    )
+    return (
+        {
+            "role": "developer",
+            "content": (
+                f"You are a document classifier and parser. You will receive an image containing a document.\n\n"
+                f"Supported Document Types: {', '.join(supported_document_types)}\n"
+                f"Parsed Document Types: {', '.join(parsed_document_types)}\n"
+                f"Status Codes:\n- {ClassifierStatusCodes.OK}: The document was classified successfully.\n{status_code_descriptions}\n\n"
+                f"Classify the document first and set 'status' to one of the status codes above. "
+                f"If the status is {ClassifierStatusCodes.OK}, set 'document_type' to the classified document type. "
+                f"If the document type is one of the parsed document types, also parse the document into 'receipt'. "
+                f"Return a JSON object with 'status', 'document_type' and 'receipt' fields; "
+                f"set the fields that do not apply to null."
+            ),
+        },
+    )
 
 
 class DocumentImageGptPipeline(DocumentImagePipeline):
@@ -13,25 +70,412 @@ class DocumentImageGptPipeline(DocumentImagePipeline):
     """
 
     def __init__(self,
-                processors: List[DocumentImageProcessor] = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["processors"],
-                classifiers: List[DocumentImageClassifier] = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["classifiers"],
-                parsers: List[DocumentImageParser] = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["parsers"]):
-        
+                processors: Optional[List[DocumentImageProcessor]] = None,
+                classifiers: Optional[List[DocumentImageClassifier]] = None,
+                parsers: Optional[List[DocumentImageParser]] = None,
+                response_format: type = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["response_format"],
+                requests_per_minute: float = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["requests_per_minute"],
+                tokens_per_minute: float = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["tokens_per_minute"],
+                estimated_tokens_per_request: int = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["estimated_tokens_per_request"],
+                max_retries: int = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["max_retries"],
+                retry_backoff_seconds: float = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["retry_backoff_seconds"],
+                batch_completion_window: str = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["batch_completion_window"],
+                batch_poll_interval_seconds: float = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["batch_poll_interval_seconds"],
+                response_cache_size: int = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["response_cache_size"]):
+
+        # Fall back to the default components, which are only built on first use
         super().__init__(
-            processors=processors,
-            classifiers=classifiers,
-            parsers=parsers
+            processors=processors if processors is not None else DOCUMENT_IMAGE_GPT_PIPELINE_REGISTRY.processors,
+            classifiers=classifiers if classifiers is not None else DOCUMENT_IMAGE_GPT_PIPELINE_REGISTRY.classifiers,
+            parsers=parsers if parsers is not None else DOCUMENT_IMAGE_GPT_PIPELINE_REGISTRY.parsers
         )
+        self.response_format = response_format
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.estimated_tokens_per_request = estimated_tokens_per_request
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.batch_completion_window = batch_completion_window
+        self.batch_poll_interval_seconds = batch_poll_interval_seconds
+        self._response_cache = ResponseCache(maxsize=response_cache_size)
+        # Shared by every batch so that together they stay within the account's rate limits
+        self._rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        # Custom IDs of the requests in each batch submitted by this pipeline,
+        # and the outputs of the images that could not be submitted
+        self._batch_custom_ids: Dict[str, List[str]] = {}
+        self._batch_skipped_outputs: Dict[str, Dict[str, DocumentImagePipelineOutput]] = {}
 
     def process(self, document_image: Union[Image.Image, str]) -> DocumentImagePipelineOutput:
         """
-        Override the process method if any specific behavior for GPT-based pipeline is required.
-        Otherwise, it will use the base class's implementation.
+        Classify and parse the document in a single GPT call when both the classifier and
+        the parsers are GPT-backed. Otherwise, fall back to the base class's implementation.
+        """
+        if not self._can_classify_and_parse():
+            return super().process(document_image)
+
+        document_image, error_output = self._prepare_document_image(document_image)
+        if error_output:
+            return error_output
+
+        return self._classify_and_parse(document_image)
+
+    def process_batch(self,
+                      document_images: List[Union[Image.Image, str]],
+                      max_concurrency: int = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["max_concurrency"]) -> List[DocumentImagePipelineOutput]:
+        """
+        Process a batch of document images concurrently.
+        Use `process_batch_async` instead when an event loop is already running.
+        Pipelines that cannot use the single GPT call fall back to the base class's batched implementation.
+        """
+        if not self._can_classify_and_parse():
+            return super().process_batch(document_images)
+
+        return asyncio.run(self.process_batch_async(document_images, max_concurrency=max_concurrency))
+
+    async def process_batch_async(self,
+                                  document_images: List[Union[Image.Image, str]],
+                                  max_concurrency: int = DOCUMENT_IMAGE_GPT_PIPELINE_CONFIG["max_concurrency"]) -> List[DocumentImagePipelineOutput]:
+        """
+        Process a batch of document images concurrently, keeping at most `max_concurrency`
+        requests in flight and staying within the configured request and token rate limits.
+        The outputs are returned in the same order as the input images.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def process_one(document_image: Union[Image.Image, str]) -> DocumentImagePipelineOutput:
+            async with semaphore:
+                # Keep one failing image from aborting the whole batch
+                try:
+                    return await self._process_async(document_image)
+                except Exception as e:
+                    return DocumentImagePipelineOutput(
+                        status=StatusCodes.ERROR,
+                        details=f"Error in processing document image: {e}",
+                    )
+
+        return await asyncio.gather(*(process_one(document_image) for document_image in document_images))
+
+    def submit_batch(self, document_images: List[Union[Image.Image, str]]) -> str:
         """
-        return super().process(document_image)
+        Submit a batch of document images to the OpenAI Batch API for offline processing.
+        Batch requests cost half as much as regular requests but may take up to 24 hours.
+
+        Images that cannot be prepared are skipped and logged; `poll_batch` reports them as errors.
+
+        :param document_images: The document images to process.
+        :return: The ID of the created batch; pass it to `poll_batch` to collect the results.
+        """
+        if not self._can_classify_and_parse():
+            raise ValueError("Batch processing requires a single GPT classifier and GPT receipt parsers.")
+
+        classifier: DocumentImageGPTClassifier = self.classifiers[0]
+        response_format = _response_format_param(self.response_format)
+
+        custom_ids = []
+        skipped_outputs: Dict[str, DocumentImagePipelineOutput] = {}
+        # Stream the requests to a temporary JSONL file instead of holding every encoded image in memory
+        with tempfile.TemporaryFile() as batch_file:
+            for index, document_image in enumerate(document_images):
+                custom_id = f"document_image_{index}"
+                try:
+                    prepared_image, error_output = self._prepare_document_image(document_image)
+                    if not error_output:
+                        messages, _, error_output = self._prepare_messages(prepared_image)
+                except Exception as e:
+                    error_output = DocumentImagePipelineOutput(
+                        status=StatusCodes.ERROR,
+                        details=f"Error in preparing document image: {e}",
+                    )
+                # Keep one failing image from aborting the whole submission
+                if error_output:
+                    logging.error("Skipping %s in batch submission: %s", custom_id, error_output.details)
+                    skipped_outputs[custom_id] = error_output
+                    continue
+
+                custom_ids.append(custom_id)
+                batch_file.write(json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": classifier.model,
+                        "messages": messages,
+                        "response_format": response_format,
+                    },
+                }).encode("utf-8"))
+                batch_file.write(b"\n")
+
+            if not custom_ids:
+                raise ValueError("None of the document images could be prepared for batch processing.")
+
+            batch_file.seek(0)
+            uploaded_file = classifier._client.files.create(
+                file=("batch.jsonl", batch_file),
+                purpose="batch",
+            )
+
+        batch = classifier._client.batches.create(
+            input_file_id=uploaded_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.batch_completion_window,
+        )
+        self._batch_skipped_outputs[batch.id] = skipped_outputs
+        self._batch_custom_ids[batch.id] = custom_ids
+        return batch.id
+
+    def poll_batch(self, batch_id: str) -> Dict[str, DocumentImagePipelineOutput]:
+        """
+        Wait for a batch submitted with `submit_batch` to finish and collect its results.
+        Expired and cancelled batches still return the requests that finished; requests
+        submitted by this pipeline without a result are reported as errors.
+
+        :param batch_id: The ID returned by `submit_batch`.
+        :return: The pipeline outputs keyed by custom ID (`document_image_<index>` of the submitted image).
+        """
+        client = self.classifiers[0]._client
+
+        batch = client.batches.retrieve(batch_id)
+        while batch.status in ("validating", "in_progress", "finalizing", "cancelling"):
+            time.sleep(self.batch_poll_interval_seconds)
+            batch = client.batches.retrieve(batch_id)
+
+        outputs = dict(self._batch_skipped_outputs.get(batch_id, {}))
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with client.files.with_streaming_response.content(file_id) as response:
+                for line in response.iter_lines():
+                    if line:
+                        custom_id, output = self._handle_batch_line(json.loads(line))
+                        outputs[custom_id] = output
+
+        for custom_id in self._batch_custom_ids.get(batch_id, ()):
+            if custom_id not in outputs:
+                outputs[custom_id] = DocumentImagePipelineOutput(
+                    status=StatusCodes.ERROR,
+                    details=f"No result in batch {batch_id}, which ended with status: {batch.status}",
+                )
+        return outputs
 
     def validate_classifier_and_parser_document_types(self) -> (bool, List[str]):
         """
         Override this method if additional validation logic specific to GPT-based pipeline is required.
         """
-        return super().validate_classifier_and_parser_document_types()
\ No newline at end of file
+        return super().validate_classifier_and_parser_document_types()
+
+    def _can_classify_and_parse(self) -> bool:
+        """
+        Check if the classifier and the parsers can be fused into a single GPT call.
+        """
+        return (
+            len(self.classifiers) == 1
+            and isinstance(self.classifiers[0], DocumentImageGPTClassifier)
+            and bool(self.parsers)
+            and all(isinstance(parser, DocumentImageGPTReceiptParser) for parser in self.parsers)
+        )
+
+    async def _process_async(self, document_image: Union[Image.Image, str]) -> DocumentImagePipelineOutput:
+        """
+        Process a single document image as part of a batch.
+        Pipelines that cannot use the single GPT call run `process` in a worker thread.
+        """
+        if not self._can_classify_and_parse():
+            return await asyncio.to_thread(self.process, document_image)
+
+        document_image, error_output = await asyncio.to_thread(self._prepare_document_image, document_image)
+        if error_output:
+            return error_output
+
+        return await self._classify_and_parse_async(document_image)
+
+    def _classify_and_parse(self, document_image: Image.Image) -> DocumentImagePipelineOutput:
+        """
+        Classify and parse the document image with one GPT request.
+        """
+        classifier: DocumentImageGPTClassifier = self.classifiers[0]
+
+        messages, cache_key, error_output = self._prepare_messages(document_image)
+        if error_output:
+            return error_output
+
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
+
+        try:
+            response = classifier._client.beta.chat.completions.parse(
+                model=classifier.model,
+                messages=messages,
+                response_format=self.response_format,
+                extra_body={"prompt_cache_key": classifier.prompt_cache_key},
+            )
+        except OpenAIError as e:
+            return DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in OpenAI API: {e}",
+            )
+
+        return self._cache_output(cache_key, self._handle_response(response))
+
+    async def _classify_and_parse_async(self, document_image: Image.Image) -> DocumentImagePipelineOutput:
+        """
+        Classify and parse the document image with one asynchronous GPT request,
+        backing off exponentially when the API reports a rate limit error.
+        """
+        classifier: DocumentImageGPTClassifier = self.classifiers[0]
+
+        messages, cache_key, error_output = await asyncio.to_thread(self._prepare_messages, document_image)
+        if error_output:
+            return error_output
+
+        cached_output = self._response_cache.get(cache_key)
+        if cached_output is not None:
+            return cached_output
+
+        # Retries are handled by the backoff loop below, so the SDK must not retry on its own
+        async_client = classifier._async_client.with_options(max_retries=0)
+        for attempt in range(self.max_retries + 1):
+            await self._rate_limiter.acquire(self.estimated_tokens_per_request)
+            try:
+                response = await async_client.beta.chat.completions.parse(
+                    model=classifier.model,
+                    messages=messages,
+                    response_format=self.response_format,
+                    extra_body={"prompt_cache_key": classifier.prompt_cache_key},
+                )
+                return self._cache_output(cache_key, self._handle_response(response))
+            except RateLimitError as e:
+                if attempt == self.max_retries:
+                    return DocumentImagePipelineOutput(
+                        status=StatusCodes.ERROR,
+                        details=f"Error in OpenAI API: {e}",
+                    )
+                await asyncio.sleep(self.retry_backoff_seconds * 2 ** attempt)
+            except OpenAIError as e:
+                return DocumentImagePipelineOutput(
+                    status=StatusCodes.ERROR,
+                    details=f"Error in OpenAI API: {e}",
+                )
+
+    def _prepare_messages(self, document_image: Image.Image) -> (List[Dict], Tuple, DocumentImagePipelineOutput):
+        """
+        Encode the image and build the messages and the response cache key for the combined GPT request.
+        """
+        try:
+            base64_image = encode_image_to_base64(
+                document_image,
+                max_side=max(parser.max_image_side for parser in self.parsers),
+            )
+        except Exception as e:
+            # Decoding errors such as truncated files surface here, not when the image is read
+            return None, None, DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in encoding image: {e}",
+            )
+
+        cache_key = ResponseCache.make_key(
+            base64_image,
+            self.classifiers[0].model,
+            PROMPT_VERSION,
+            tuple(self.classifiers[0].supported_document_types),
+            tuple(parser.target_document_type for parser in self.parsers),
+        )
+        return self._generate_user_prompt(base64_image), cache_key, None
+
+    def _cache_output(self, cache_key: Tuple, output: DocumentImagePipelineOutput) -> DocumentImagePipelineOutput:
+        """
+        Cache successful outputs so that re-submitted images skip the API call.
+        """
+        if output.status == StatusCodes.FINISHED_SUCCESS:
+            self._response_cache.set(cache_key, output)
+        return output
+
+    def _handle_response(self, response) -> DocumentImagePipelineOutput:
+        """
+        Convert the combined GPT response into the pipeline output.
+        """
+        try:
+            return self._to_pipeline_output(response.choices[0].message.parsed)
+        except Exception as e:
+            return DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in handling OpenAI response: {e}",
+            )
+
+    def _handle_batch_line(self, line: Dict) -> (str, DocumentImagePipelineOutput):
+        """
+        Convert one line of a Batch API output or error file into the pipeline output.
+        """
+        response = line.get("response") or {}
+        if line.get("error") or response.get("status_code") != 200:
+            return line["custom_id"], DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in OpenAI API: {line.get('error') or response.get('body')}",
+            )
+
+        # A refused or truncated completion must not abort the collection of the other results
+        try:
+            message = response["body"]["choices"][0]["message"]
+            if message.get("content") is None:
+                return line["custom_id"], DocumentImagePipelineOutput(
+                    status=StatusCodes.ERROR,
+                    details=f"Missing structured output: {message.get('refusal')}",
+                )
+            result = self.response_format.model_validate_json(message["content"])
+        except (ValidationError, KeyError, IndexError, TypeError) as e:
+            return line["custom_id"], DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in parsing OpenAI response: {e}",
+            )
+        return line["custom_id"], self._to_pipeline_output(result)
+
+    def _to_pipeline_output(self, result: ClassifyAndParseOutput) -> DocumentImagePipelineOutput:
+        """
+        Convert the combined classification and parsing result into the pipeline output.
+        """
+        classifier: DocumentImageGPTClassifier = self.classifiers[0]
+
+        if result is None or result.status != ClassifierStatusCodes.OK:
+            status = result.status if result else ClassifierStatusCodes.UNKNOWN_ERROR
+            return DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in classifying document type: {classifier._error_messages.get(status, status)}",
+            )
+
+        parser = self._parser_by_type.get(result.document_type)
+        if not parser:
+            return DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"No parser found for document type: {result.document_type}",
+            )
+
+        if result.receipt is None:
+            return DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in parsing document: {parser._error_messages[ParserStatusCodes.EXTRACTION_FAILED]}",
+            )
+
+        return DocumentImagePipelineOutput(
+            status=StatusCodes.FINISHED_SUCCESS,
+            details=DocumentImageReceiptParserOutput(status=ParserStatusCodes.OK, details=result.receipt),
+        )
+
+    def _generate_user_prompt(self, base64_image: str) -> List[Dict]:
+        """
+        Generate the structured messages for the combined GPT input.
+        The image is always the last message so the developer prompt stays cacheable.
+        """
+        prompt_prefix = _build_prompt_prefix(
+            tuple(self.classifiers[0].supported_document_types),
+            tuple(parser.target_document_type for parser in self.parsers),
+        )
+        return [
+            *prompt_prefix,
+            {
+                "role": "user",
+                "content": [
+                    _USER_TEXT_PART,
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}},
+                ],
+            },
+        ]
@@ -1,13 +1,17 @@
 from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import os
 from PIL import Image
 from pydantic import BaseModel, Field
-from typing import List, Union, Dict
+from typing import List, Optional, Union, Dict
 from document_image_parsers import DocumentImageParser, DocumentImageParserOutput
 from document_image_parsers import StatusCodes as ParserStatusCodes
-from document_image_classifiers import DocumentImageClassifier, DocumentImageClassifierOutput
+from document_image_classifiers import DocumentImageClassifier, DocumentImageClassifierOutput, ClassifierSchema
 from document_image_classifiers import StatusCodes as ClassifierStatusCodes
 from document_image_processors import DocumentImageProcessor
-from utils import read_image, StrEnum
+from utils import read_image, mean_vote, StrEnum
 
 
 class StatusCodes(StrEnum):
@@ -26,72 +30,150 @@ class DocumentImagePipelineOutput(BaseModel):
         description="Details of the document image processing."
     )
 
+def _vote_key(result: DocumentImageClassifierOutput) -> tuple:
+    """
+    Hashable key of a classification result, so that equal results count as the same vote.
+    """
+    return result.status, getattr(result.details, "document_type", result.details)
+
 class DocumentImagePipeline(ABC):
     def __init__(self,
-                processors: List[DocumentImageProcessor] = [],
-                classifiers: List[DocumentImageClassifier] = [],
-                parsers: List[DocumentImageParser] = []):
+                processors: Optional[List[DocumentImageProcessor]] = None,
+                classifiers: Optional[List[DocumentImageClassifier]] = None,
+                parsers: Optional[List[DocumentImageParser]] = None):
         
-        self.processors = processors
-        self.classifiers = classifiers
-        self.parsers = parsers
+        # Copy the lists so that adding components never mutates the caller's lists
+        self.processors = list(processors) if processors else []
+        self.classifiers = list(classifiers) if classifiers else []
+        self.parsers = list(parsers) if parsers else []
+        # Ids of the components for constant-time duplicate checks
+        self._processor_ids = {id(processor) for processor in self.processors}
+        self._classifier_ids = {id(classifier) for classifier in self.classifiers}
+        self._parser_ids = {id(parser) for parser in self.parsers}
+        self._update_classifier_types()
+        self._update_supported_types()
 
     @abstractmethod
     def process(self, document_image: Union[Image.Image, str]) -> DocumentImagePipelineOutput:
         """
         Process the document image through the pipeline.
         """
-        if not document_image:
-            raise ValueError("An image must be provided.")
+        document_image, error_output = self._prepare_document_image(document_image)
+        if error_output:
+            return error_output
 
-        is_valid, missing_documents = self.validate_classifier_and_parser_document_types()
-        if not is_valid:
-            return DocumentImagePipelineOutput(
-                status=StatusCodes.ERROR,
-                details=f"Missing parsers for document types: {missing_documents}",
-            )
-        try:
-            document_image = read_image(document_image)
-        except Exception as e:
-            return DocumentImagePipelineOutput(
-                status=StatusCodes.ERROR,
-                details=f"Error in reading image: {e}",
-            )
+        # Classify the document type
+        classification = self._vote(self._classify(document_image))
 
-        try:
-            # Apply processors
-            for processor in self.processors:
-                document_image = processor.process(document_image)
-        except Exception as e:
-            return DocumentImagePipelineOutput(
-                status=StatusCodes.ERROR,
-                details=f"Error in processing image: {e}",
-            )
+        # Find the appropriate parser
+        parser, error_output = self._select_parser(classification)
+        if error_output:
+            return error_output
 
-        # Classify the document type
-        classification_results : List[DocumentImageClassifierOutput] = [classifier.classify(document_image) for classifier in self.classifiers]
-        document_type = max(set(classification_results), key=classification_results.count)
+        # Parse the document
+        return self._from_parser_output(parser.parse(document_image))
 
-        if document_type.details != ClassifierStatusCodes.OK:
-            return DocumentImagePipelineOutput(
+    def process_batch(self, document_images: List[Union[Image.Image, str]]) -> List[DocumentImagePipelineOutput]:
+        """
+        Process a batch of document images through the pipeline.
+        The images are read and processed in a thread pool with one worker per CPU, since Pillow
+        and OpenCV release the GIL while decoding and resizing. Each classifier classifies the whole
+        batch in one call and the documents are parsed with one call per document type.
+        The outputs are returned in the same order as the input images.
+        """
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            prepared = list(executor.map(self._prepare_document_image, document_images))
+
+        outputs: List[DocumentImagePipelineOutput] = [error_output for _, error_output in prepared]
+        ready = [index for index, (_, error_output) in enumerate(prepared) if error_output is None]
+        if not ready:
+            return outputs
+
+        # Classify the batch with every classifier and vote per document
+        batch_results = [classifier.classify_batch([prepared[index][0] for index in ready]) for classifier in self.classifiers]
+        parser_batches: Dict[DocumentImageParser, List[int]] = {}
+        for index, classification_results in zip(ready, zip(*batch_results)):
+            parser, error_output = self._select_parser(self._vote(list(classification_results)))
+            if error_output:
+                outputs[index] = error_output
+            else:
+                parser_batches.setdefault(parser, []).append(index)
+
+        # Parse the documents of each type in one call
+        for parser, indices in parser_batches.items():
+            parser_results = parser.parse_batch([prepared[index][0] for index in indices])
+            for index, parser_result in zip(indices, parser_results):
+                outputs[index] = self._from_parser_output(parser_result)
+
+        return outputs
+
+    def _vote(self, classification_results: List[DocumentImageClassifierOutput]) -> DocumentImageClassifierOutput:
+        """
+        Return the classification of the ensemble.
+        Results that carry a `posterior` distribution together with the `classes` (document types)
+        it is indexed by are combined by mean posterior probability, as long as every result is OK;
+        otherwise the majority label wins, so error statuses are never replaced by a document type.
+        """
+        if all(
+            result.status == ClassifierStatusCodes.OK
+            and getattr(result, "posterior", None) is not None
+            and getattr(result, "classes", None) is not None
+            for result in classification_results
+        ):
+            return self._posterior_vote(classification_results)
+
+        votes = Counter(_vote_key(result) for result in classification_results)
+        winning_key, _ = votes.most_common(1)[0]
+        return next(result for result in classification_results if _vote_key(result) == winning_key)
+
+    def _posterior_vote(self, classification_results: List[DocumentImageClassifierOutput]) -> DocumentImageClassifierOutput:
+        """
+        Combine the posteriors of the ensemble and return the document type with the highest mean probability.
+        Classifiers may order or cover the document types differently; classes a classifier does not
+        know get a probability of zero from it.
+        """
+        document_types = list(dict.fromkeys(
+            document_type for result in classification_results for document_type in result.classes
+        ))
+        class_indices = {document_type: index for index, document_type in enumerate(document_types)}
+
+        probs = np.zeros((len(classification_results), len(document_types)))
+        for row, result in enumerate(classification_results):
+            probs[row, [class_indices[document_type] for document_type in result.classes]] = result.posterior
+
+        return DocumentImageClassifierOutput[ClassifierSchema](
+            status=ClassifierStatusCodes.OK,
+            details=ClassifierSchema(document_type=document_types[mean_vote(probs)]),
+        )
+
+    def _select_parser(self, classification: DocumentImageClassifierOutput) -> (DocumentImageParser, DocumentImagePipelineOutput):
+        """
+        Find the parser for the classified document type.
+
+        Returns:
+            tuple:
+                - DocumentImageParser: The parser, or None if an error occurred.
+                - DocumentImagePipelineOutput: The error output, or None if a parser was found.
+        """
+        if classification.status != ClassifierStatusCodes.OK:
+            return None, DocumentImagePipelineOutput(
                 status=StatusCodes.ERROR,
-                details=f"Error in classifying document type: {document_type.details}",
+                details=f"Error in classifying document type: {classification.details}",
             )
-        
-        # Find the appropriate parser
-        parser = next(
-            (parser for parser in self.parsers if parser.target_document_type == document_type),
-            None
-        )
+
+        document_type = classification.details.document_type
+        parser = self._parser_by_type.get(document_type)
         if not parser:
-            return DocumentImagePipelineOutput(
+            return None, DocumentImagePipelineOutput(
                 status=StatusCodes.ERROR,
                 details=f"No parser found for document type: {document_type}",
             )
+        return parser, None
 
-        
-        # Parse the document
-        parser_result : DocumentImageParserOutput = parser.parse(document_image)
+    def _from_parser_output(self, parser_result: DocumentImageParserOutput) -> DocumentImagePipelineOutput:
+        """
+        Convert the parser result into the pipeline output.
+        """
         if parser_result.status != ParserStatusCodes.OK:
             return DocumentImagePipelineOutput(
                 status= StatusCodes.ERROR,
@@ -102,8 +184,67 @@ class DocumentImagePipeline(ABC):
             status=StatusCodes.FINISHED_SUCCESS,
             details=parser_result,
         )
-        
-        
+
+    def _classify(self, document_image: Image.Image) -> List[DocumentImageClassifierOutput]:
+        """
+        Classify the document image with every classifier in the ensemble.
+        The classifiers are independent, so more than one runs concurrently in a thread pool.
+        """
+        if len(self.classifiers) <= 1:
+            return [classifier.classify(document_image) for classifier in self.classifiers]
+
+        with ThreadPoolExecutor(max_workers=len(self.classifiers)) as executor:
+            return list(executor.map(lambda classifier: classifier.classify(document_image), self.classifiers))
+
+    def _prepare_document_image(self, document_image: Union[Image.Image, str]) -> (Image.Image, DocumentImagePipelineOutput):
+        """
+        Validate the pipeline, read the document image and apply the processors.
+
+        Returns:
+            tuple:
+                - Image.Image: The processed image, or None if an error occurred.
+                - DocumentImagePipelineOutput: The error output, or None if the image is ready.
+        """
+        if not document_image:
+            raise ValueError("An image must be provided.")
+
+        # The result only changes when classifiers or parsers are added
+        if not self._validated:
+            is_valid, missing_documents = self.validate_classifier_and_parser_document_types()
+            if not is_valid:
+                return None, DocumentImagePipelineOutput(
+                    status=StatusCodes.ERROR,
+                    details=f"Missing parsers for document types: {missing_documents}",
+                )
+            self._validated = True
+        try:
+            # Images are opened lazily; reduced-scale JPEG decoding is left to the processors,
+            # which know the size they resize to
+            document_image = read_image(document_image)
+        except Exception as e:
+            return None, DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in reading image: {e}",
+            )
+
+        try:
+            document_image = self._run_processors(document_image)
+        except Exception as e:
+            return None, DocumentImagePipelineOutput(
+                status=StatusCodes.ERROR,
+                details=f"Error in processing image: {e}",
+            )
+
+        return document_image, None
+
+    def _run_processors(self, document_image: Image.Image) -> Image.Image:
+        """
+        Apply the processors to the document image in order.
+        """
+        for processor in self.processors:
+            document_image = processor.process(document_image)
+        return document_image
+
     @abstractmethod
     def validate_classifier_and_parser_document_types(self) -> (bool, List[str]):
         """
@@ -114,58 +255,80 @@ class DocumentImagePipeline(ABC):
                 - bool: True if all document types returned by classifiers are supported by parsers, False otherwise.
                 - List[str]: A list of missing document types (if any).
         """
-        # Get supported document types from parsers
-        supported_document_types = [parser.target_document_type for parser in self.parsers]
-
-        # Collect all document types supported by classifiers
-        classifier_document_types = [
-            doc_type for classifier in self.classifiers for doc_type in classifier.supported_document_types
-        ]
-
         # Identify missing document types
-        missing_document_types = list(set(classifier_document_types) - set(supported_document_types))
+        missing_document_types = list(self._classifier_types - self._supported_types)
 
         # Return a tuple indicating validity and missing document types
         return not bool(missing_document_types), missing_document_types
 
+    def _update_classifier_types(self):
+        """
+        Cache the document types supported by the classifiers.
+        """
+        self._classifier_types = frozenset(
+            doc_type for classifier in self.classifiers for doc_type in classifier.supported_document_types
+        )
+        self._validated = False
+
+    def _update_supported_types(self):
+        """
+        Cache the parsers by document type and the document types they support.
+        The first parser added for a document type handles it.
+        """
+        self._parser_by_type: Dict[str, DocumentImageParser] = {
+            parser.target_document_type: parser for parser in reversed(self.parsers)
+        }
+        self._supported_types = frozenset(self._parser_by_type)
+        self._validated = False
+
     def add_processor(self, processor: DocumentImageProcessor):
-        if processor in self.processors:
+        if id(processor) in self._processor_ids:
             raise ValueError("Processor is already in the pipeline.")
         self.processors.append(processor)
+        self._processor_ids.add(id(processor))
 
     def add_processors(self, processors: List[DocumentImageProcessor]):
         for processor in processors:
-            if processor in self.processors:
+            if id(processor) in self._processor_ids:
                 raise ValueError(f"Processor {processor} is already in the pipeline.")
         self.processors.extend(processors)
+        self._processor_ids.update(id(processor) for processor in processors)
 
     def add_classifier(self, classifier: DocumentImageClassifier):
-        if classifier in self.classifiers:
+        if id(classifier) in self._classifier_ids:
             raise ValueError("Classifier is already in the pipeline.")
         
         if not classifier.supported_document_types:
             raise ValueError("Classifier must support at least one document type.")
         self.classifiers.append(classifier)
+        self._classifier_ids.add(id(classifier))
+        self._update_classifier_types()
 
     def add_classifiers(self, classifiers: List[DocumentImageClassifier]):
         for classifier in classifiers:
-            if classifier in self.classifiers:
+            if id(classifier) in self._classifier_ids:
                 raise ValueError(f"Classifier {classifier} is already in the pipeline.")
             if not classifier.supported_document_types:
                 raise ValueError(f"Classifier {classifier} must support at least one document type.")
         self.classifiers.extend(classifiers)
+        self._classifier_ids.update(id(classifier) for classifier in classifiers)
+        self._update_classifier_types()
 
     def add_parser(self, parser: DocumentImageParser):
-        if parser in self.parsers:
+        if id(parser) in self._parser_ids:
             raise ValueError("Parser is already in the pipeline.")
         if not parser.target_document_type:
             raise ValueError("Parser must have a target document type.")
         self.parsers.append(parser)
+        self._parser_ids.add(id(parser))
+        self._update_supported_types()
 
     def add_parsers(self, parsers: List[DocumentImageParser]):
         for parser in parsers:
-            if parser in self.parsers:
+            if id(parser) in self._parser_ids:
                 raise ValueError(f"Parser {parser} is already in the pipeline.")
             if not parser.target_document_type:
                 raise ValueError(f"Parser {parser} must have a target document type.")
-        self.parsers.extend(parsers)
\ No newline at end of file
+        self.parsers.extend(parsers)
+        self._parser_ids.update(id(parser) for parser in parsers)
+        self._update_supported_types()
\ No newline at end of file
@@ -1,2 +1,5 @@
 from .document_format_converter import *
-from .document_image_resizer import *
\ No newline at end of file
+from .document_image_resizer import *
+from .document_image_resize_converter import *
+from .document_image_vips_resize_converter import *
+from .cuda_document_image_resizer import *
\ No newline at end of file
@@ -0,0 +1,69 @@
+from document_image_processors.implementations.document_image_resizer import DocumentImageResizer, IMAGE_SIZES
+from PIL import Image
+from typing import Dict
+from utils import is_unmodified_file_image
+import logging
+
+# Modes that can be copied to the GPU as they are
+TENSOR_MODES = ("L", "RGB")
+
+class CudaDocumentImageResizer(DocumentImageResizer):
+    def __init__(self, image_sizes: Dict[str, Dict[str, int]] = IMAGE_SIZES, device: str = "cuda"):
+        """
+        Initialize the CudaDocumentImageResizer with configurable image sizes.
+        
+        :param image_sizes: A dictionary defining source and target dimensions for each size category.
+        :param device: The CUDA device to decode and resize on.
+        """
+        # Imported here so that importing the processors does not pay for loading torch
+        try:
+            import torch
+            from torchvision.io import ImageReadMode, decode_jpeg
+            from torchvision.transforms.v2 import functional
+        except ImportError as e:
+            raise ImportError("CudaDocumentImageResizer requires torch and torchvision to be installed.") from e
+        if not torch.cuda.is_available():
+            raise RuntimeError("CudaDocumentImageResizer requires a CUDA device.")
+        super().__init__(image_sizes=image_sizes)
+        self.device = device
+        self._torch = torch
+        self._image_read_mode = ImageReadMode
+        self._decode_jpeg = decode_jpeg
+        self._functional = functional
+
+    def process(self, image: Image.Image) -> Image.Image:
+        """
+        Dynamically resize image on the GPU based on its original dimensions.
+        JPEG images opened from a file and not loaded yet are decoded on the GPU with nvJPEG, skipping the CPU decode.
+        """
+        try:
+            target_size = self._get_target_size(max(image.size))
+            if max(image.size) <= target_size:
+                return image
+            tensor = self._to_device(image)
+            height, width = tensor.shape[-2:]
+            scaling_factor = target_size / float(max(width, height))
+            resized = self._functional.resize(
+                tensor,
+                [max(1, round(height * scaling_factor)), max(1, round(width * scaling_factor))],
+                antialias=True,
+            )
+            return self._functional.to_pil_image(resized.cpu())
+        except Exception as e:
+            logging.error("Error in resizing image on GPU: %s", e)
+            return image
+
+    def _to_device(self, image: Image.Image):
+        """
+        Move the image to the GPU as a uint8 (C, H, W) tensor.
+        """
+        # Decode from the file only if no in-place edit can have happened since it was opened
+        if image.format == "JPEG" and is_unmodified_file_image(image):
+            with open(image.filename, "rb") as file:
+                data = self._torch.frombuffer(bytearray(file.read()), dtype=self._torch.uint8)
+            mode = self._image_read_mode.GRAY if image.mode == "L" else self._image_read_mode.RGB
+            return self._decode_jpeg(data, mode=mode, device=self.device)
+
+        if image.mode not in TENSOR_MODES:
+            image = image.convert("RGB")
+        return self._functional.pil_to_tensor(image).pin_memory().to(self.device, non_blocking=True)
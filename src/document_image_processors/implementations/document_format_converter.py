@@ -1,7 +1,5 @@
 from document_image_processors.interfaces import DocumentImageProcessor
 from PIL import Image
-from typing import Union
-from utils import read_image
 import logging
 
 TARGET_FORMAT = "RGB"
@@ -18,13 +16,14 @@ class DocumentFormatConverter(DocumentImageProcessor):
         self.target_format = target_format
 
     
-    def process(self, image: Union[Image.Image, str]) -> Union[Image.Image, str]:
+    def process(self, image: Image.Image) -> Image.Image:
         """
         Convert the image to a different format.
         """
         try:
-            image = read_image(image)
+            if image.mode == self.target_format:
+                return image
             return image.convert(self.target_format)
         except Exception as e:
-            logging.error(f"Error in converting image format: {e}")
+            logging.error("Error in converting image format: %s", e)
             return image
\ No newline at end of file
@@ -0,0 +1,45 @@
+from document_image_processors.implementations.document_format_converter import TARGET_FORMAT
+from document_image_processors.implementations.document_image_resizer import DocumentImageResizer, IMAGE_SIZES
+from PIL import Image
+from typing import Dict, Literal
+from utils import is_unmodified_file_image
+import logging
+
+# Modes that JPEG draft decoding can produce directly
+DRAFT_MODES = ("RGB", "L")
+
+class DocumentImageResizeConverter(DocumentImageResizer):
+    def __init__(self,
+                target_format: str = TARGET_FORMAT,
+                image_sizes: Dict[str, Dict[str, int]] = IMAGE_SIZES,
+                engine: Literal["pil", "cv2"] = "cv2"):
+        """
+        Initialize the DocumentImageResizeConverter with a target format and configurable image sizes.
+        
+        :param target_format: The target format to convert the image to.
+        :param image_sizes: A dictionary defining source and target dimensions for each size category.
+        :param engine: The resize backend, either "pil" or "cv2" (OpenCV).
+        """
+        super().__init__(image_sizes=image_sizes, engine=engine)
+        self.target_format = target_format
+
+    def process(self, image: Image.Image) -> Image.Image:
+        """
+        Convert and resize the image with a single decode.
+        JPEG images opened from a file and not loaded yet are decoded directly at a reduced scale
+        when they are at least twice the target size; the image passed in is never modified.
+        """
+        try:
+            target_size = self._get_target_size(max(image.size))
+            resized_image = image
+            if (image.format == "JPEG" and self.target_format in DRAFT_MODES
+                    and is_unmodified_file_image(image) and min(image.size) >= 2 * target_size):
+                # Draft a fresh handle on the file, since draft() reconfigures the image in place
+                resized_image = Image.open(image.filename)
+                resized_image.draft(self.target_format, (target_size, target_size))
+            if resized_image.mode != self.target_format:
+                resized_image = resized_image.convert(self.target_format)
+            return self._resize_with_options(resized_image, target_size, maintain_aspect=True)
+        except Exception as e:
+            logging.error("Error in resizing and converting image: %s", e)
+            return image
@@ -1,7 +1,8 @@
 from document_image_processors.interfaces import DocumentImageProcessor
 from PIL import Image
-from typing import Union, Dict
-from utils import read_image
+from typing import Dict, Literal, Tuple
+import cv2
+import numpy as np
 import logging
 
 IMAGE_SIZES = {
@@ -10,25 +11,41 @@ IMAGE_SIZES = {
     "SMALL": {"source": 600, "target": 600},
 }
 
+# Image.ANTIALIAS was removed in Pillow 10; Resampling.LANCZOS is the same filter
+LANCZOS = getattr(Image, "Resampling", Image).LANCZOS
+
+RESIZE_ENGINES = ("pil", "cv2")
+# Modes whose pixel arrays OpenCV can interpolate directly
+CV2_MODES = ("L", "RGB", "RGBA")
+
 class DocumentImageResizer(DocumentImageProcessor):
-    def __init__(self, image_sizes: Dict[str, Dict[str, int]] = IMAGE_SIZES):
+    def __init__(self, image_sizes: Dict[str, Dict[str, int]] = IMAGE_SIZES, engine: Literal["pil", "cv2"] = "cv2"):
         """
         Initialize the DocumentImageResizer with configurable image sizes.
         
         :param image_sizes: A dictionary defining source and target dimensions for each size category.
+        :param engine: The resize backend, either "pil" or "cv2" (OpenCV).
         """
+        if engine not in RESIZE_ENGINES:
+            raise ValueError(f"Unsupported resize engine: {engine}. Use one of {RESIZE_ENGINES}.")
         self.image_sizes = image_sizes
+        self.engine = engine
+        # (source, target) pairs from the largest source down, so the first match is the tightest
+        self._thresholds = tuple(sorted(
+            ((dimensions["source"], dimensions["target"]) for dimensions in image_sizes.values()),
+            reverse=True
+        ))
+        self._default_target_size = image_sizes["SMALL"]["target"]  # Default to SMALL if no match
         
-    def process(self, image: Union[Image.Image, str]) -> Union[Image.Image, str]:
+    def process(self, image: Image.Image) -> Image.Image:
         """
         Dynamically resize image based on its original dimensions.
         Ensures the image is not excessively resized to avoid quality loss.
         """
         try:
-            image = read_image(image)
             return self._resize_image(image)
         except Exception as e:
-            logging.error(f"Error in resizing image: {e}")
+            logging.error("Error in resizing image: %s", e)
             return image
 
     def _resize_image(self, image: Image.Image) -> Image.Image:
@@ -43,24 +60,39 @@ class DocumentImageResizer(DocumentImageProcessor):
         """
         Determine the target size based on the maximum dimension of the image.
         """
-        for size_category, dimensions in self.image_sizes.items():
-            if max_dimension > dimensions["source"]:
-                return dimensions["target"]
-        return self.image_sizes["SMALL"]["target"]  # Default to SMALL if no match
+        for source, target in self._thresholds:
+            if max_dimension > source:
+                return target
+        return self._default_target_size
 
     def _resize_with_options(self, image: Image.Image, target_size: int, maintain_aspect: bool = True) -> Image.Image:
         """
         Resize the image to a target size dynamically, preserving aspect ratio if specified.
+        When preserving aspect ratio, images are only ever downscaled.
         """
+        use_cv2 = self.engine == "cv2" and image.mode in CV2_MODES
         if maintain_aspect:
-            # Calculate new dimensions while maintaining aspect ratio
-            width, height = image.size
-            scaling_factor = target_size / float(max(width, height))
-            new_width = int(width * scaling_factor)
-            new_height = int(height * scaling_factor)
-            resized_image = image.resize((new_width, new_height), Image.ANTIALIAS)
+            # Images that already fit are returned as they are
+            if max(image.size) <= target_size:
+                return image
+            if use_cv2:
+                width, height = image.size
+                scaling_factor = target_size / float(max(width, height))
+                return self._resize_cv2(image, (max(1, round(width * scaling_factor)), max(1, round(height * scaling_factor))))
+            # thumbnail preserves the aspect ratio and reduces large images before resampling
+            resized_image = image.copy()
+            resized_image.thumbnail((target_size, target_size), LANCZOS)
+        elif use_cv2:
+            resized_image = self._resize_cv2(image, (target_size, target_size))
         else:
             # Directly resize to the exact target size (square)
-            resized_image = image.resize((target_size, target_size), Image.ANTIALIAS)
+            resized_image = image.resize((target_size, target_size), LANCZOS)
+
+        return resized_image
 
-        return resized_image
\ No newline at end of file
+    def _resize_cv2(self, image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+        """
+        Resize the image with OpenCV, using area interpolation to downscale and Lanczos to upscale.
+        """
+        interpolation = cv2.INTER_AREA if size[0] * size[1] < image.width * image.height else cv2.INTER_LANCZOS4
+        return Image.fromarray(cv2.resize(np.asarray(image), size, interpolation=interpolation))
\ No newline at end of file
@@ -0,0 +1,55 @@
+from document_image_processors.implementations.document_format_converter import TARGET_FORMAT
+from document_image_processors.implementations.document_image_resizer import DocumentImageResizer, IMAGE_SIZES
+from PIL import Image
+from typing import Dict
+from utils import is_unmodified_file_image
+import logging
+
+try:
+    import pyvips
+except (ImportError, OSError):  # pyvips is optional and also needs the libvips shared library
+    pyvips = None
+
+# libvips colourspaces for the supported target formats
+VIPS_COLOURSPACES = {"RGB": "srgb", "L": "b-w"}
+
+class DocumentImageVipsResizeConverter(DocumentImageResizer):
+    def __init__(self, target_format: str = TARGET_FORMAT, image_sizes: Dict[str, Dict[str, int]] = IMAGE_SIZES):
+        """
+        Initialize the DocumentImageVipsResizeConverter with a target format and configurable image sizes.
+        
+        :param target_format: The target format to convert the image to, either "RGB" or "L".
+        :param image_sizes: A dictionary defining source and target dimensions for each size category.
+        """
+        if pyvips is None:
+            raise ImportError("DocumentImageVipsResizeConverter requires pyvips and libvips to be installed.")
+        if target_format not in VIPS_COLOURSPACES:
+            raise ValueError(f"Unsupported target format: {target_format}. Use one of {tuple(VIPS_COLOURSPACES)}.")
+        super().__init__(image_sizes=image_sizes)
+        self.target_format = target_format
+
+    def process(self, image: Image.Image) -> Image.Image:
+        """
+        Convert and downscale the image in a single libvips pipeline.
+        Images opened from a file and not loaded yet are decoded by libvips with shrink-on-load; the result
+        is only materialized as a PIL image at the end.
+        """
+        try:
+            target_size = self._get_target_size(max(image.size))
+            if is_unmodified_file_image(image):
+                # Keep the stored orientation, as the Pillow processors do
+                vips_image = pyvips.Image.thumbnail(image.filename, target_size, height=target_size, size="down", no_rotate=True)
+            else:
+                if image.mode not in VIPS_COLOURSPACES:
+                    image = image.convert(self.target_format)
+                vips_image = pyvips.Image.new_from_memory(
+                    image.tobytes(), image.width, image.height, len(image.getbands()), "uchar"
+                ).thumbnail_image(target_size, height=target_size, size="down")
+
+            if vips_image.hasalpha():
+                vips_image = vips_image.flatten(background=255)
+            vips_image = vips_image.colourspace(VIPS_COLOURSPACES[self.target_format]).cast("uchar")
+            return Image.frombytes(self.target_format, (vips_image.width, vips_image.height), vips_image.write_to_memory())
+        except Exception as e:
+            logging.error("Error in resizing and converting image with libvips: %s", e)
+            return image
@@ -1,10 +1,9 @@
 from abc import ABC, abstractmethod
 from pydantic import BaseModel
 from PIL import Image
-from typing import Union
 class DocumentImageProcessor(ABC):
     
     @abstractmethod
-    def process(self, image: Union[Image.Image, str]) -> Union[Image.Image, str]:
-        """Process the image and return the processed image"""
+    def process(self, image: Image.Image) -> Image.Image:
+        """Process the already opened image and return the processed image"""
         pass
\ No newline at end of file
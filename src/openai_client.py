@@ -0,0 +1,31 @@
+from functools import lru_cache
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+
+from env_config import OPENAI_API_KEY
+
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+
+
+@lru_cache(maxsize=None)
+def get_openai_client(api_key: str = OPENAI_API_KEY) -> OpenAI:
+    """
+    Return the shared OpenAI client for an API key.
+    Sharing one client lets classifiers, parsers and pipelines reuse its keep-alive connections.
+    The SDK's default httpx client keeps its timeouts, redirect and proxy handling; only the pool limits change.
+    """
+    return OpenAI(api_key=api_key, http_client=DefaultHttpxClient(limits=_http_limits()))
+
+
+@lru_cache(maxsize=None)
+def get_async_openai_client(api_key: str = OPENAI_API_KEY) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for an API key.
+    """
+    return AsyncOpenAI(api_key=api_key, http_client=DefaultAsyncHttpxClient(limits=_http_limits()))
@@ -1,3 +1,6 @@
 from .image_utils import *
 from .struct_utils import *
-from .file_utils import *
\ No newline at end of file
+from .file_utils import *
+from .rate_limit_utils import *
+from .cache_utils import *
+from .voting_utils import *
\ No newline at end of file
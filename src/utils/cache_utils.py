@@ -0,0 +1,40 @@
+import hashlib
+import threading
+from typing import Any, Hashable, Optional, Tuple
+from cachetools import LRUCache
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache for API outputs, keyed on a hash of the encoded image
+    and the settings that affect the request (model, prompt version, ...).
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize the ResponseCache.
+
+        :param maxsize: Maximum number of outputs to keep.
+        """
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(base64_image: str, *settings: Hashable) -> Tuple[Hashable, ...]:
+        """
+        Build a cache key from the encoded image and the request settings.
+
+        :param base64_image: Base64-encoded image sent to the API.
+        :param settings: Request settings that change the output for the same image.
+        :return: The cache key.
+        """
+        digest = hashlib.blake2b(base64_image.encode("ascii"), digest_size=16).hexdigest()
+        return (digest, *settings)
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        with self._lock:
+            self._cache[key] = value
@@ -1,5 +1,6 @@
 
 import json
+import mmap
 import os
 from io import BytesIO
 from typing import Union
@@ -32,14 +33,22 @@ def read_image(image : Union[Image.Image, str]) -> Image.Image:
     """
     Read an image from a PIL.Image.Image object or a file path.
 
-    :param image: PIL.Image.Image object or a file path to the image.
+    :param image: PIL.Image.Image object or a file path to the image, relative to the input directory or absolute.
     :return: PIL.Image.Image object.
     """
     if isinstance(image, Image.Image):
         return image
     elif isinstance(image, str):  # Assume it's a file path
-        img_path = os.path.join(IMAGE_INPUT_FILE_PATH, image)
-        return Image.open(img_path)
+        # Absolute paths are used as they are; relative ones are resolved against the input directory
+        img_path = image if os.path.isabs(image) else os.path.join(IMAGE_INPUT_FILE_PATH, image)
+        # Decode from a read-only memory map of the file instead of buffered reads;
+        # the map stays alive with the lazily loaded image
+        with open(img_path, "rb") as file:
+            mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        img = Image.open(mapped_file)
+        # Keep the source path, which Image.open cannot take from a memory map
+        img.filename = img_path
+        return img
     else:
         raise ValueError("Unsupported image type. Provide a PIL.Image.Image or a file path.")
 
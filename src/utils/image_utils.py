@@ -1,4 +1,5 @@
 import base64
+import inspect
 import os
 from typing import Union
 from io import BytesIO
@@ -7,30 +8,91 @@ import logging
 from utils.file_utils import read_image
 
 
-def encode_image_to_base64(image: Union[Image.Image, str], image_format: str = "JPEG") -> str:
+def encode_image_to_base64(image: Union[Image.Image, str, bytes],
+                           image_format: str = "JPEG",
+                           max_side: int = 1024,
+                           quality: int = 85) -> str:
     """
-    Encode a PIL Image or an image file path to a base64 string.
+    Encode a PIL Image, an image file path or encoded image bytes to a base64 string.
+    Images larger than `max_side` are downscaled first, preserving the aspect ratio.
+    Source JPEGs that already fit are encoded from their original bytes, skipping the PIL re-encode,
+    as long as their pixels were never loaded and so cannot have been edited in place.
 
-    :param image: PIL.Image.Image object or a file path to the image.
+    :param image: PIL.Image.Image object, a file path to the image or encoded image bytes.
     :param image_format: Desired format for the image (e.g., 'JPEG', 'JPG', 'PNG').
+    :param max_side: Maximum width or height of the encoded image.
+    :param quality: JPEG quality of the encoded image.
     :return: Base64-encoded string of the image.
     """
     
-    image = read_image(image)
+    raw_bytes = None
+    if isinstance(image, bytes):
+        raw_bytes = image
+        image = Image.open(BytesIO(raw_bytes))
+    else:
+        image = read_image(image)
+        if is_unmodified_file_image(image) and _can_pass_through(image, image_format, max_side):
+            with open(image.filename, "rb") as file:
+                raw_bytes = file.read()
+
+    if raw_bytes is not None and _can_pass_through(image, image_format, max_side):
+        return base64.b64encode(raw_bytes).decode("ascii")
+
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if image_format.upper() in ("JPEG", "JPG") and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
     buffered = BytesIO()
-    image.save(buffered, format=image_format.upper())
-    return base64.b64encode(buffered.getvalue()).decode("utf-8")
+    image.save(buffered, format=image_format.upper(), quality=quality)
+    # Encode straight from the buffer's memory instead of a copy of its contents
+    with buffered.getbuffer() as view:
+        return base64.b64encode(view).decode("ascii")
+
+def is_unmodified_file_image(image: Image.Image) -> bool:
+    """
+    Check if an image was opened from a file and its pixels were never loaded.
+    Only then is the file guaranteed to hold the image's contents; loaded images may have been edited in place.
+
+    :param image: PIL.Image.Image object.
+    :return: True if the image can be read back from its source file, False otherwise.
+    """
+    return bool(getattr(image, "filename", None)) and getattr(image, "_im", getattr(image, "im", None)) is None
+
+def _can_pass_through(image: Image.Image, image_format: str, max_side: int) -> bool:
+    """
+    Check if an image read from encoded bytes can be sent as-is without re-encoding.
+    """
+    return (
+        image.format == "JPEG"
+        and image_format.upper() in ("JPEG", "JPG")
+        and image.mode in ("RGB", "L")
+        and max(image.size) <= max_side
+        # Images decoded at a reduced scale by draft() no longer match their source bytes
+        and (getattr(image, "decoderconfig", None) or (1,))[0] == 1
+    )
 
 def handle_errors(default_value):
     """
     A decorator to handle errors in methods and return a default value if an exception occurs.
+    Works for both regular and async methods.
     """
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            async def async_wrapper(*args, **kwargs):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    logging.error("Error in %s: %s", func.__name__, e)
+                    return default_value
+            return async_wrapper
+
         def wrapper(*args, **kwargs):
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                logging.error(f"Error in {func.__name__}: {e}")
+                logging.error("Error in %s: %s", func.__name__, e)
                 return default_value
         return wrapper
     return decorator
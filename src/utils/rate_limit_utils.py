@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for requests-per-minute and tokens-per-minute limits.
+
+    Both buckets refill continuously; `acquire` waits until one request and the
+    requested number of tokens are available. One limiter can be shared by batches
+    running on different event loops or threads.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        """
+        Initialize the RateLimiter with request and token limits.
+
+        :param requests_per_minute: Maximum number of requests per minute.
+        :param tokens_per_minute: Maximum number of tokens per minute.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = requests_per_minute
+        self._available_tokens = tokens_per_minute
+        self._last_update = time.monotonic()
+        # A thread lock guards the buckets; it is never held across an await
+        self._lock = threading.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Wait until the request and its tokens fit within the rate limits, then consume them.
+
+        :param tokens: The estimated number of tokens the request will consume.
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._available_requests >= 1 and self._available_tokens >= tokens:
+                    self._available_requests -= 1
+                    self._available_tokens -= tokens
+                    return
+                wait_seconds = self._seconds_until_available(tokens)
+            await asyncio.sleep(wait_seconds)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_update
+        self._last_update = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + self.requests_per_minute * elapsed / 60.0,
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + self.tokens_per_minute * elapsed / 60.0,
+        )
+
+    def _seconds_until_available(self, tokens: int) -> float:
+        missing_requests = max(0.0, 1 - self._available_requests)
+        missing_tokens = max(0.0, tokens - self._available_tokens)
+        return max(
+            missing_requests * 60.0 / self.requests_per_minute,
+            missing_tokens * 60.0 / self.tokens_per_minute,
+            0.001,
+        )
@@ -0,0 +1,42 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy reduction is used without it
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _mean_vote_kernel(probs: np.ndarray) -> int:
+        """
+        Sum the posteriors of each class in one pass and return the index of the largest sum.
+        The largest sum is also the largest mean, so the division is skipped.
+        """
+        n_classifiers, n_classes = probs.shape
+        best_class = 0
+        best_total = -np.inf
+        for class_index in range(n_classes):
+            total = 0.0
+            for classifier_index in range(n_classifiers):
+                total += probs[classifier_index, class_index]
+            if total > best_total:
+                best_total = total
+                best_class = class_index
+        return best_class
+else:
+    _mean_vote_kernel = None
+
+
+def mean_vote(probs: np.ndarray) -> int:
+    """
+    Return the class with the highest mean posterior probability across an ensemble of classifiers.
+    Uses a Numba kernel when numba is installed and a NumPy reduction otherwise.
+
+    :param probs: Array of shape (n_classifiers, n_classes) with the posterior distribution of each classifier.
+    :return: Index of the winning class.
+    """
+    probs = np.ascontiguousarray(probs, dtype=np.float64)
+    if _mean_vote_kernel is None:
+        return int(probs.mean(axis=0).argmax())
+    return int(_mean_vote_kernel(probs))